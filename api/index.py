@@ -14,6 +14,9 @@ from fastapi.responses import JSONResponse
 from src.auth.routes import router as auth_router
 from src.blog.routes import router as blog_router
 from src.contact.routes import router as contact_router
+from src.feed.routes import router as feed_router
+from src.events.routes import router as events_router
+from src.tasks import start_background_tasks, stop_background_tasks
 
 app = FastAPI(title="Concepts Blog API")
 
@@ -24,6 +27,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Causal-Token", "X-Served-From", "Age", "Warning"],
 )
 
 # Custom exception handler
@@ -48,6 +52,16 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(blog_router, prefix="/blogs", tags=["blogs"])
 app.include_router(contact_router, prefix="/contact", tags=["contact"])
+app.include_router(feed_router, tags=["feed"])
+app.include_router(events_router, prefix="/events", tags=["events"])
+
+@app.on_event("startup")
+def on_startup():
+    start_background_tasks()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    stop_background_tasks()
 
 @app.get("/")
 def root():
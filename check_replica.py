@@ -0,0 +1,32 @@
+# run from project root against a replica set, e.g. a local one started with
+#   mongod --replSet rs0 ... (x3) and rs.initiate()
+# DATABASE_URL=mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0 python check_replica.py
+from datetime import datetime
+
+from src.database.connection import client, db, read_db, READ_MAX_STALENESS_SECONDS
+
+if client is None:
+    raise SystemExit("No database configured, set DATABASE_URL and MONGO_DB_NAME")
+
+hello = client.admin.command("hello")
+print(f"Replica set: {hello.get('setName') or 'none (standalone)'}")
+print(f"Primary: {hello.get('primary')}, secondaries: {hello.get('hosts')}")
+print(f"Public reads use {read_db.read_preference} (max staleness {READ_MAX_STALENESS_SECONDS}s)")
+
+# write on the primary, then read through the secondary-preferred handle in a
+# session advanced to the write's operation time, like an admin request would
+with client.start_session(causal_consistency=True) as write_session:
+    res = db.blogs.insert_one(
+        {"title": "replica check", "content": "", "created_at": datetime.utcnow()},
+        session=write_session,
+    )
+    token = write_session.operation_time
+print(f"Wrote {res.inserted_id} at {token.time}.{token.inc}")
+
+try:
+    with client.start_session(causal_consistency=True) as read_session:
+        read_session.advance_operation_time(token)
+        doc = read_db.blogs.find_one({"_id": res.inserted_id}, session=read_session)
+        print(f"Causal read {'saw' if doc else 'MISSED'} the write")
+finally:
+    db.blogs.delete_one({"_id": res.inserted_id})
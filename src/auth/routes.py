@@ -1,18 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from src.database.connection import get_db
 from src.utils.security import hash_password, verify_password, create_access_token
+from src.utils.rate_limit import RateLimit, client_ip
 
 router = APIRouter()
 
+LOGIN_IP_LIMIT = RateLimit("login-ip", capacity=10, per_seconds=60)
+LOGIN_USER_LIMIT = RateLimit("login-user", capacity=5, per_seconds=300)
+
 class LoginRequest(BaseModel):
     username: str
     password: str
 
 @router.post("/login")
-def login(payload: LoginRequest, db=Depends(get_db)):
+def login(payload: LoginRequest, request: Request, db=Depends(get_db)):
+    # throttle before the user lookup and the bcrypt check
+    ip = client_ip(request)
+    LOGIN_IP_LIMIT.check(ip)
+    # only failed attempts from this address count against the username, so
+    # guessing from elsewhere cannot lock the real admin out
+    user_key = f"{payload.username.lower()}:{ip}"
+    LOGIN_USER_LIMIT.ensure_available(user_key)
     user = db.users.find_one({"username": payload.username})
     if not user or not verify_password(payload.password, user["password"]):
+        LOGIN_USER_LIMIT.charge(user_key)
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     token = create_access_token({"sub": user["username"]})
     return {"access_token": token, "token_type": "bearer"}
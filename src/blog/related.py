@@ -0,0 +1,195 @@
+import html
+import math
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+from bson import ObjectId
+from pymongo import ReplaceOne
+
+RELATED_COUNT = 5
+# the matrix is dense: posts x MAX_FEATURES float32
+MAX_FEATURES = 5000
+# rows scored per matrix product, bounding the score block to CHUNK_ROWS x posts
+CHUNK_ROWS = 512
+
+# title and tags say more about a post than any single body word
+TITLE_WEIGHT = 3
+TAG_WEIGHT = 2
+
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_TOKEN_RE = re.compile(r"[a-z0-9]{2,}")
+_STOPWORDS = frozenset(
+    "the and for are but not you all any can had her was one our out has his how its may new now "
+    "see who did get let say she too use that this with have from they will your what when which "
+    "there their them then than into just more also some been were would could should about".split()
+)
+
+_PROJECTION = {"title": 1, "content": 1, "tags": 1, "type": 1, "cover_image": 1}
+
+
+def _tokens(text):
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _term_counts(doc):
+    counts = Counter(_tokens(html.unescape(_HTML_TAG_RE.sub(" ", doc.get("content") or ""))))
+    for term in _tokens(doc.get("title") or ""):
+        counts[term] += TITLE_WEIGHT
+    for tag in list(doc.get("tags") or []) + [doc.get("type") or ""]:
+        for term in _tokens(tag):
+            counts[term] += TAG_WEIGHT
+    return counts
+
+
+def _summary(doc):
+    return {
+        "id": str(doc["_id"]),
+        "title": doc.get("title"),
+        "cover_image": doc.get("cover_image"),
+        "type": doc.get("type"),
+    }
+
+
+class RelatedIndex:
+    """
+    TF-IDF vectors of all posts kept as one L2-normalised matrix, so cosine
+    similarity against every post is a single matrix product.
+
+    Results are written to the related_posts collection keyed by blog _id;
+    the API only reads that collection. Writes update the affected rows
+    incrementally against the vocabulary of the last full rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ids = []           # row -> blog ObjectId
+        self.summaries = []     # row -> summary stored with related entries
+        self.neighbors = []     # row -> list of neighbour rows
+        self.kth_scores = None  # row -> score of its weakest neighbour
+        self.vocab = {}
+        self.idf = None
+        self.matrix = None
+
+    def _vectorize(self, counts):
+        vec = np.zeros(len(self.vocab), dtype=np.float32)
+        for term, count in counts.items():
+            col = self.vocab.get(term)
+            if col is not None:
+                vec[col] = (1 + math.log(count)) * self.idf[col]
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _top_rows(self, rows):
+        """Recompute neighbours and kth score for the given rows."""
+        if not rows:
+            return
+        rows = sorted(rows)
+        k = min(RELATED_COUNT, len(self.ids) - 1)
+        for start in range(0, len(rows), CHUNK_ROWS):
+            chunk = rows[start:start + CHUNK_ROWS]
+            scores = self.matrix[chunk] @ self.matrix.T
+            for i, row in enumerate(chunk):
+                row_scores = scores[i]
+                row_scores[row] = -1
+                if k <= 0:
+                    self.neighbors[row] = []
+                    self.kth_scores[row] = 0
+                    continue
+                top = np.argpartition(-row_scores, k - 1)[:k]
+                top = [int(r) for r in top[np.argsort(-row_scores[top])] if row_scores[r] > 0]
+                self.neighbors[row] = top
+                # a post with fewer than k matches accepts any positive score
+                self.kth_scores[row] = row_scores[top[-1]] if len(top) == k else 0
+
+    def _write(self, db, rows, stored=None):
+        """Store the lists for rows, skipping those whose list equals stored[_id]."""
+        now = datetime.utcnow()
+        ops = []
+        for row in rows:
+            related = [dict(self.summaries[r], score=round(float(self.matrix[row] @ self.matrix[r]), 4)) for r in self.neighbors[row]]
+            if stored is not None and stored.get(self.ids[row]) == related:
+                continue
+            ops.append(ReplaceOne({"_id": self.ids[row]}, {"related": related, "updated_at": now}, upsert=True))
+        if ops:
+            db.related_posts.bulk_write(ops, ordered=False)
+
+    def rebuild(self, db):
+        """Recompute vocabulary, IDF weights and every post's neighbours."""
+        with self._lock:
+            docs = list(db.blogs.find({}, _PROJECTION))
+            counts = [_term_counts(d) for d in docs]
+            df = Counter()
+            for c in counts:
+                df.update(c.keys())
+
+            terms = [t for t, _ in df.most_common(MAX_FEATURES)]
+            self.vocab = {t: i for i, t in enumerate(terms)}
+            n = len(docs)
+            self.idf = np.array([math.log((1 + n) / (1 + df[t])) + 1 for t in terms], dtype=np.float32)
+            self.matrix = np.vstack([self._vectorize(c) for c in counts]) if n else np.zeros((0, len(terms)), dtype=np.float32)
+
+            self.ids = [d["_id"] for d in docs]
+            self.summaries = [_summary(d) for d in docs]
+            self.neighbors = [[] for _ in docs]
+            self.kth_scores = np.zeros(n, dtype=np.float32)
+            self._top_rows(range(n))
+            # every worker rebuilds on start; only rewrite lists that changed
+            stored = {d["_id"]: d.get("related") for d in db.related_posts.find({}, {"related": 1})}
+            self._write(db, range(n), stored)
+            db.related_posts.delete_many({"_id": {"$nin": self.ids}})
+            print(f"Related posts index rebuilt for {n} posts ({len(terms)} terms)")
+
+    def update_post(self, db, blog_id: str):
+        """Re-index one created or edited post and the posts whose lists it changes."""
+        if self.matrix is None:
+            return self.rebuild(db)
+        doc = db.blogs.find_one({"_id": ObjectId(blog_id)}, _PROJECTION)
+        if not doc:
+            return self.remove_post(db, blog_id)
+
+        with self._lock:
+            vec = self._vectorize(_term_counts(doc))
+            if doc["_id"] in self.ids:
+                row = self.ids.index(doc["_id"])
+                self.matrix[row] = vec
+                self.summaries[row] = _summary(doc)
+            else:
+                row = len(self.ids)
+                self.ids.append(doc["_id"])
+                self.summaries.append(_summary(doc))
+                self.neighbors.append([])
+                self.matrix = np.vstack([self.matrix, vec])
+                self.kth_scores = np.append(self.kth_scores, np.float32(0))
+
+            scores = self.matrix @ vec
+            scores[row] = -1
+            affected = {row}
+            affected.update(int(r) for r in np.nonzero(scores > self.kth_scores)[0])
+            affected.update(r for r, nb in enumerate(self.neighbors) if row in nb)
+            self._top_rows(affected)
+            self._write(db, affected)
+
+    def remove_post(self, db, blog_id: str):
+        oid = ObjectId(blog_id)
+        db.related_posts.delete_one({"_id": oid})
+        with self._lock:
+            if self.matrix is None or oid not in self.ids:
+                return
+            row = self.ids.index(oid)
+            affected = [r for r, nb in enumerate(self.neighbors) if row in nb]
+            del self.ids[row]
+            del self.summaries[row]
+            del self.neighbors[row]
+            self.matrix = np.delete(self.matrix, row, axis=0)
+            self.kth_scores = np.delete(self.kth_scores, row)
+            # rows after the removed one shift up by one
+            self.neighbors = [[r - 1 if r > row else r for r in nb] for nb in self.neighbors]
+            affected = [r - 1 if r > row else r for r in affected]
+            self._top_rows(affected)
+            self._write(db, affected)
+
+
+related_index = RelatedIndex()
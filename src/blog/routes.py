@@ -1,11 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
-from src.database.connection import get_db
-from src.models.schemas import BlogCreate, BlogUpdate
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from src.database.connection import DB_UNAVAILABLE_ERRORS, get_db, get_read_db, get_session, open_db_circuit, set_causal_token
+from src.database.snapshot import public_snapshot
+from src.models.schemas import BlogCreate, BlogUpdate, BlogAutosave, BlogBatchRequest
 from src.auth.deps import get_current_user, require_admin
 from src.utils.cloudinary_upload import upload_image_to_cloudinary, delete_image_from_cloudinary
+from src.utils.text_delta import apply_utf16_delta, bmp_only_expression, has_astral_characters, text_delta_expression
+from src.utils.image_gc import collect_orphaned_images
+from src.feed.feeds import invalidate_feeds
+from src.blog.related import related_index
+from src.blog.view_counter import view_counter
+from src.events.bus import publish_local
+from src.utils.bulk_transfer import TRANSFER_COLLECTIONS, IMPORT_BATCH_SIZE, export_ndjson, import_ndjson
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import ConnectionFailure
 from datetime import datetime
 import os
+import sys
 import uuid
 import io
 from pathlib import Path
@@ -30,16 +42,69 @@ if _cloud_name and _cloud_key and _cloud_secret:
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# upper bound on edits accepted by a single autosave request
+MAX_AUTOSAVE_EDITS = 500
+# upper bound on ids accepted by one batch fetch
+MAX_BATCH_IDS = 100
+
 def _doc_to_dict(doc):
     if not doc:
         return None
     doc["id"] = str(doc["_id"])
     doc.pop("_id", None)
+    # posts created before autosave existed have no version yet
+    doc.setdefault("version", 0)
     return doc
 
+def _blog_data_changed(db, background_tasks: BackgroundTasks, blog_id: str = None, action: str = "updated", reindex: bool = True, notify: bool = True):
+    """
+    Keep derived data (feed, sitemap, related posts) in step with the blogs
+    collection and notify event stream clients. Pass blog_id and action
+    ("created", "updated" or "deleted") for a single post; without blog_id
+    everything that depends on blogs is rebuilt. reindex=False leaves the
+    related posts index to the periodic rebuild; notify=False skips the event.
+    """
+    invalidate_feeds()
+    if blog_id is None:
+        background_tasks.add_task(related_index.rebuild, db)
+        publish_local("blog.bulk_changed", {})
+        return
+    if action == "deleted":
+        background_tasks.add_task(related_index.remove_post, db, blog_id)
+    elif reindex:
+        background_tasks.add_task(related_index.update_post, db, blog_id)
+    if notify:
+        publish_local(f"blog.{action}", {"id": blog_id})
+
+def _snapshot_or_raise(response: Response):
+    """
+    Called while handling a database outage: return the on-disk snapshot of
+    public data and mark the response as stale, or re-raise the outage error.
+    A connection failure also opens the circuit so the next requests skip
+    the database instead of each waiting for server selection to time out.
+    """
+    if isinstance(sys.exc_info()[1], ConnectionFailure):
+        open_db_circuit()
+    snapshot = public_snapshot.current()
+    if snapshot is None:
+        raise
+    response.headers["X-Served-From"] = "snapshot"
+    response.headers["Age"] = str(snapshot.age_seconds())
+    response.headers["Warning"] = '110 - "Response is Stale"'
+    return snapshot
+
+def _version_filter(version: int):
+    # a missing version field counts as version 0
+    if version == 0:
+        return {"version": {"$in": [0, None]}}
+    return {"version": version}
+
 @router.get("/types")
-def list_types(db=Depends(get_db)):
-    types = db.blogs.distinct("type")
+def list_types(response: Response, db=Depends(get_read_db), session=Depends(get_session)):
+    try:
+        types = db.blogs.distinct("type", session=session)
+    except DB_UNAVAILABLE_ERRORS:
+        types = _snapshot_or_raise(response).blog_types
     # Filter out None/empty types if needed
     clean_types = [t for t in types if t]
     # Return as list of objects to match frontend expectations if necessary, 
@@ -48,31 +113,40 @@ def list_types(db=Depends(get_db)):
     return {"items": [{"id": t, "name": t} for t in clean_types]}
 
 @router.put("/types/{old_type}")
-def rename_type(old_type: str, new_type: str = Form(...), user = Depends(require_admin), db=Depends(get_db)):
+def rename_type(old_type: str, background_tasks: BackgroundTasks, response: Response, new_type: str = Form(...), user = Depends(require_admin), db=Depends(get_db), session=Depends(get_session)):
     # Update all blogs with old_type to new_type
     result = db.blogs.update_many(
         {"type": old_type},
-        {"$set": {"type": new_type}}
+        {"$set": {"type": new_type}},
+        session=session
     )
+    set_causal_token(response, session)
+    _blog_data_changed(db, background_tasks)
     return {"status": "updated", "modified_count": result.modified_count}
 
 @router.delete("/types/{type_name}")
-def delete_type(type_name: str, user = Depends(require_admin), db=Depends(get_db)):
+def delete_type(type_name: str, background_tasks: BackgroundTasks, response: Response, user = Depends(require_admin), db=Depends(get_db), session=Depends(get_session)):
     # Remove type from all blogs that have it (set to null or empty string)
     result = db.blogs.update_many(
         {"type": type_name},
-        {"$unset": {"type": ""}}
+        {"$unset": {"type": ""}},
+        session=session
     )
+    set_causal_token(response, session)
+    _blog_data_changed(db, background_tasks)
     return {"status": "deleted", "modified_count": result.modified_count}
 
 
 
 @router.get("/")
 def list_blogs(
+    response: Response,
     type: str = None, 
     page: int = 1, 
     limit: int = 100, 
-    db=Depends(get_db)
+    sort: str = "latest",
+    db=Depends(get_read_db),
+    session=Depends(get_session)
 ):
     query = {}
     if type and type != "All":
@@ -80,9 +154,17 @@ def list_blogs(
 
     skip = (page - 1) * limit
     
-    total = db.blogs.count_documents(query)
-    cursor = db.blogs.find(query).sort("created_at", -1).skip(skip).limit(limit)
-    docs = list(cursor)
+    if sort == "popular":
+        # served from the views/created_at indexes created at startup
+        order = [("views", -1), ("created_at", -1)]
+    else:
+        order = [("created_at", -1)]
+    try:
+        total = db.blogs.count_documents(query, session=session)
+        cursor = db.blogs.find(query, session=session).sort(order).skip(skip).limit(limit)
+        docs = list(cursor)
+    except DB_UNAVAILABLE_ERRORS:
+        total, docs = _snapshot_or_raise(response).list_posts(query.get("type"), skip, limit, sort)
     
     return {
         "items": [_doc_to_dict(d) for d in docs],
@@ -94,17 +176,22 @@ def list_blogs(
 
 
 @router.get("/types")
-def list_types(db=Depends(get_db)):
-    docs = list(db.types.find().sort("name", 1))
+def list_types(response: Response, db=Depends(get_read_db), session=Depends(get_session)):
+    try:
+        docs = list(db.types.find(session=session).sort("name", 1))
+    except DB_UNAVAILABLE_ERRORS:
+        return {"items": _snapshot_or_raise(response).types}
     return {"items": [{"id": str(d["_id"]), "name": d["name"], "image": d.get("image")} for d in docs]}
 
 
 @router.post("/types", status_code=201)
 def create_type(
+    response: Response,
     name: str = Form(...), 
     image: UploadFile | None = File(None),
     user=Depends(require_admin), 
-    db=Depends(get_db)
+    db=Depends(get_db),
+    session=Depends(get_session)
 ):
     if db.types.find_one({"name": name}):
         raise HTTPException(status_code=400, detail="Type already exists")
@@ -137,30 +224,164 @@ def create_type(
         "image": image_url,
         "created_by": user["username"], 
         "created_at": datetime.utcnow()
-    })
+    }, session=session)
+    set_causal_token(response, session)
     return {"id": str(res.inserted_id), "name": name, "image": image_url}
 
 @router.delete("/types/{type_id}", status_code=204)
-def delete_type(type_id: str, user=Depends(require_admin), db=Depends(get_db)):
+def delete_type(type_id: str, response: Response, user=Depends(require_admin), db=Depends(get_db), session=Depends(get_session)):
     try:
         oid = ObjectId(type_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid type id")
-    result = db.types.delete_one({"_id": oid})
+    result = db.types.delete_one({"_id": oid}, session=session)
+    set_causal_token(response, session)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Type not found")
     return {}
 
+@router.get("/export")
+def export_content(collections: str = None, user=Depends(require_admin), db=Depends(get_db)):
+    """
+    Stream blogs and types as NDJSON, one {"collection", "doc"} object per line.
+    """
+    names = [c.strip() for c in collections.split(",") if c.strip()] if collections else list(TRANSFER_COLLECTIONS)
+    unknown = [n for n in names if n not in TRANSFER_COLLECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown collections: {', '.join(unknown)}")
+    filename = f"concepts-export-{datetime.utcnow():%Y%m%d%H%M%S}.ndjson"
+    return StreamingResponse(
+        export_ndjson(db, names),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.post("/import")
+def import_content(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    start_line: int = Form(0),
+    batch_size: int = Form(IMPORT_BATCH_SIZE),
+    user=Depends(require_admin),
+    db=Depends(get_db)
+):
+    """
+    Import an NDJSON export. Documents are upserted in batches. If the
+    database fails part way the response is a 503 with status "partial" and
+    a checkpoint; resend the file with start_line set to that checkpoint to
+    continue where it stopped.
+    """
+    if batch_size < 1:
+        raise HTTPException(status_code=400, detail="batch_size must be positive")
+    stats = import_ndjson(db, file.file, batch_size=batch_size, start_line=start_line)
+    _blog_data_changed(db, background_tasks)
+    if stats["status"] == "partial":
+        return JSONResponse(status_code=503, content=stats, background=background_tasks)
+    return stats
+
+@router.post("/maintenance/image-gc")
+def run_image_gc(dry_run: bool = True, user=Depends(require_admin), db=Depends(get_db)):
+    """
+    Find (and unless dry_run, delete) cover, type and inline images in
+    Cloudinary and uploads/ that no blog or type references anymore.
+    """
+    return collect_orphaned_images(db, dry_run=dry_run, upload_dir=UPLOAD_DIR)
+
+def _batch_fetch(ids, fields, response: Response, db, session):
+    """
+    Fetch many posts with one $in query and return them in the requested
+    order, with {"id", "error"} markers for invalid or missing ids.
+    """
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"Too many ids (max {MAX_BATCH_IDS})")
+    if fields and any(f.startswith("$") or f == "_id" for f in fields):
+        raise HTTPException(status_code=400, detail="Invalid field name")
+
+    valid = {}
+    for blog_id in ids:
+        try:
+            valid[blog_id] = ObjectId(blog_id)
+        except Exception:
+            pass
+
+    projection = {f: 1 for f in fields} if fields else None
+    try:
+        docs = db.blogs.find({"_id": {"$in": list(set(valid.values()))}}, projection, session=session)
+        found = {str(d["_id"]): d for d in docs}
+    except DB_UNAVAILABLE_ERRORS:
+        snapshot = _snapshot_or_raise(response)
+        found = {}
+        for blog_id in valid:
+            doc = snapshot.get_post(blog_id)
+            if doc:
+                found[blog_id] = {k: v for k, v in doc.items() if k == "_id" or not fields or k in fields}
+
+    items = []
+    for blog_id in ids:
+        if blog_id not in valid:
+            items.append({"id": blog_id, "error": "invalid_id"})
+        elif blog_id not in found:
+            items.append({"id": blog_id, "error": "not_found"})
+        elif fields:
+            doc = dict(found[blog_id])
+            doc["id"] = str(doc.pop("_id"))
+            items.append(doc)
+        else:
+            items.append(_doc_to_dict(dict(found[blog_id])))
+    return {"items": items}
+
+@router.get("/batch")
+def get_blogs_batch(
+    response: Response,
+    ids: str = Query(..., description="Comma separated blog ids"),
+    fields: str = Query(None, description="Comma separated fields to return"),
+    db=Depends(get_read_db),
+    session=Depends(get_session)
+):
+    id_list = [i.strip() for i in ids.split(",") if i.strip()]
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    return _batch_fetch(id_list, field_list, response, db, session)
+
+@router.post("/batch")
+def post_blogs_batch(
+    payload: BlogBatchRequest,
+    response: Response,
+    db=Depends(get_read_db),
+    session=Depends(get_session)
+):
+    """Same as GET /batch, for id lists too long for a query string."""
+    return _batch_fetch(payload.ids, payload.fields, response, db, session)
+
 @router.get("/{blog_id}")
-def get_blog(blog_id: str, db=Depends(get_db)):
+def get_blog(blog_id: str, background_tasks: BackgroundTasks, response: Response, db=Depends(get_read_db), session=Depends(get_session)):
     try:
-        doc = db.blogs.find_one({"_id": ObjectId(blog_id)})
+        oid = ObjectId(blog_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid blog id")
+    try:
+        doc = db.blogs.find_one({"_id": oid}, session=session)
+    except DB_UNAVAILABLE_ERRORS:
+        doc = _snapshot_or_raise(response).get_post(blog_id)
+        if not doc:
+            raise HTTPException(status_code=404, detail="Blog not found")
+        return _doc_to_dict(doc)
     if not doc:
         raise HTTPException(status_code=404, detail="Blog not found")
+    # views are buffered and written in bulk, not with a $inc per read
+    if view_counter.record(doc["_id"]):
+        background_tasks.add_task(view_counter.flush, get_db())
+    doc["views"] = doc.get("views", 0) + view_counter.pending(doc["_id"])
     return _doc_to_dict(doc)
 
+@router.get("/{blog_id}/related")
+def get_related_blogs(blog_id: str, db=Depends(get_read_db)):
+    try:
+        oid = ObjectId(blog_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid blog id")
+    doc = db.related_posts.find_one({"_id": oid})
+    return {"items": doc["related"] if doc else []}
+
 @router.post("/upload-image", status_code=201)
 def upload_image(
     cover: UploadFile = File(...),
@@ -201,13 +422,16 @@ def upload_image(
 
 @router.post("/", status_code=201)
 def create_blog(
+    background_tasks: BackgroundTasks,
+    response: Response,
     title: str = Form(...),
     content: str = Form(...),
     tags: str = Form(None),
     type: str = Form(None),
     cover: UploadFile = File(None),
     user = Depends(require_admin),
-    db=Depends(get_db)
+    db=Depends(get_db),
+    session=Depends(get_session)
 ):
     # handle tags (comma separated)
     tag_list = []
@@ -251,9 +475,12 @@ def create_blog(
         "author": user["username"],
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
+        "version": 0,
     }
 
-    res = db.blogs.insert_one(doc)
+    res = db.blogs.insert_one(doc, session=session)
+    set_causal_token(response, session)
+    _blog_data_changed(db, background_tasks, str(res.inserted_id), action="created")
     return {"id": str(res.inserted_id), "image_url": cover_url}
 
 from typing import Optional
@@ -261,12 +488,15 @@ from typing import Optional
 @router.put("/{blog_id}")
 def update_blog(
     blog_id: str,
+    background_tasks: BackgroundTasks,
+    response: Response,
     title: str = Form(None),
     content: str = Form(None),
     type: str = Form(None),
     cover: Optional[UploadFile] = File(None),
     user = Depends(require_admin),
-    db=Depends(get_db)
+    db=Depends(get_db),
+    session=Depends(get_session)
 ):
     try:
         oid = ObjectId(blog_id)
@@ -274,7 +504,7 @@ def update_blog(
         raise HTTPException(status_code=400, detail="Invalid blog id")
     
     # Check if blog exists first
-    existing_blog = db.blogs.find_one({"_id": oid})
+    existing_blog = db.blogs.find_one({"_id": oid}, session=session)
     if not existing_blog:
         raise HTTPException(status_code=404, detail="Blog not found")
 
@@ -315,18 +545,121 @@ def update_blog(
         return {"status": "no changes"}
 
     update_data["updated_at"] = datetime.utcnow()
-    db.blogs.update_one({"_id": oid}, {"$set": update_data})
-    return {"status": "updated"}
+    # bump the version so in-flight autosaves based on the old content conflict
+    updated = db.blogs.find_one_and_update(
+        {"_id": oid},
+        {"$set": update_data, "$inc": {"version": 1}},
+        projection={"version": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    set_causal_token(response, session)
+    _blog_data_changed(db, background_tasks, blog_id)
+    return {"status": "updated", "version": updated["version"] if updated else None}
+
+@router.patch("/{blog_id}")
+def autosave_blog(
+    blog_id: str,
+    payload: BlogAutosave,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    user = Depends(require_admin),
+    db=Depends(get_db),
+    session=Depends(get_session)
+):
+    """
+    Apply a text delta to a blog's content.
+    Edit positions are UTF-16 code units (JavaScript string indices).
+    The edits are applied against `version`; if the post changed since then
+    the save is rejected with 409 and the client should reload.
+    """
+    try:
+        oid = ObjectId(blog_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid blog id")
+
+    if len(payload.edits) > MAX_AUTOSAVE_EDITS:
+        raise HTTPException(status_code=422, detail=f"Too many edits (max {MAX_AUTOSAVE_EDITS})")
+
+    try:
+        content_expr, required_length = text_delta_expression("content", payload.edits)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    now = datetime.utcnow()
+    # autosaved_at marks the write so the change stream can skip its event
+    update_fields = {"updated_at": now, "autosaved_at": now}
+    if payload.edits:
+        update_fields["content"] = content_expr
+    if payload.title is not None:
+        update_fields["title"] = {"$literal": payload.title}
+
+    query = {"_id": oid, **_version_filter(payload.version)}
+    if payload.edits:
+        # server side offsets are code points, which match UTF-16 offsets only
+        # when the content has no astral characters
+        query["$expr"] = {"$and": [
+            {"$gte": [{"$strLenCP": {"$ifNull": ["$content", ""]}}, required_length]},
+            bmp_only_expression("content"),
+        ]}
+
+    # single atomic round trip: the version guard and the edits run server side
+    updated = db.blogs.find_one_and_update(
+        query,
+        [{"$set": update_fields}, {"$set": {"version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}}}],
+        projection={"version": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    if updated:
+        set_causal_token(response, session)
+        # autosaves come every few seconds while typing: update_blog and the
+        # periodic rebuild keep related posts current, and only a title
+        # change is worth an event (the change stream filters the same way)
+        _blog_data_changed(db, background_tasks, blog_id, reindex=False, notify=payload.title is not None)
+        return {"status": "updated", "version": updated["version"]}
+
+    # the update did not match: find out why
+    current = db.blogs.find_one({"_id": oid}, {"version": 1, "content": 1}, session=session)
+    if not current:
+        raise HTTPException(status_code=404, detail="Blog not found")
+    current_version = current.get("version", 0)
+    if current_version != payload.version:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Blog was modified by another save", "version": current_version},
+        )
+    if not has_astral_characters(current.get("content")):
+        raise HTTPException(status_code=422, detail="Edit range is out of bounds")
+
+    # content with emoji etc.: convert the UTF-16 offsets here and write the
+    # result, still guarded by the version we read it at
+    try:
+        update_fields["content"] = {"$literal": apply_utf16_delta(current.get("content"), payload.edits)}
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    updated = db.blogs.find_one_and_update(
+        {"_id": oid, **_version_filter(payload.version)},
+        [{"$set": update_fields}, {"$set": {"version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}}}],
+        projection={"version": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    if not updated:
+        raise HTTPException(status_code=409, detail={"message": "Blog was modified by another save"})
+    set_causal_token(response, session)
+    _blog_data_changed(db, background_tasks, blog_id, reindex=False, notify=payload.title is not None)
+    return {"status": "updated", "version": updated["version"]}
 
 @router.delete("/{blog_id}", status_code=204)
-def delete_blog(blog_id: str, user = Depends(require_admin), db=Depends(get_db)):
+def delete_blog(blog_id: str, background_tasks: BackgroundTasks, response: Response, user = Depends(require_admin), db=Depends(get_db), session=Depends(get_session)):
     try:
         oid = ObjectId(blog_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid blog id")
     
     # Get blog to delete image from Cloudinary
-    blog = db.blogs.find_one({"_id": oid})
+    blog = db.blogs.find_one({"_id": oid}, session=session)
     if not blog:
         raise HTTPException(status_code=404, detail="Blog not found")
     
@@ -337,5 +670,7 @@ def delete_blog(blog_id: str, user = Depends(require_admin), db=Depends(get_db))
         except Exception:
             pass  # Continue even if image deletion fails
     
-    result = db.blogs.delete_one({"_id": oid})
+    result = db.blogs.delete_one({"_id": oid}, session=session)
+    set_causal_token(response, session)
+    _blog_data_changed(db, background_tasks, blog_id, action="deleted")
     return {}
@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+from collections import Counter
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# at most this many seconds of views are lost if the process dies
+FLUSH_INTERVAL_SECONDS = float(os.getenv("VIEW_FLUSH_INTERVAL_SECONDS", "10"))
+# flush early when this many posts have pending views
+FLUSH_MAX_KEYS = 1000
+
+
+def ensure_view_indexes(db):
+    # serve "popular" ordering (optionally filtered by type) from an index
+    db.blogs.create_index([("views", -1), ("created_at", -1)])
+    db.blogs.create_index([("type", 1), ("views", -1), ("created_at", -1)])
+
+
+class ViewCounter:
+    """
+    Buffer view increments in memory and write them with one unordered
+    bulk_write instead of a $inc per request.
+    """
+
+    def __init__(self):
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, oid) -> bool:
+        """Count one view. Returns True when a flush is due."""
+        with self._lock:
+            self._pending[oid] += 1
+            return (
+                len(self._pending) >= FLUSH_MAX_KEYS
+                or time.monotonic() - self._last_flush >= FLUSH_INTERVAL_SECONDS
+            )
+
+    def pending(self, oid) -> int:
+        return self._pending.get(oid, 0)
+
+    def flush(self, db) -> int:
+        """Write all buffered views. Returns the number of posts updated."""
+        with self._lock:
+            batch, self._pending = self._pending, Counter()
+            self._last_flush = time.monotonic()
+        if not batch:
+            return 0
+
+        ops = [UpdateOne({"_id": oid}, {"$inc": {"views": n}}) for oid, n in batch.items()]
+        try:
+            db.blogs.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            print(f"View counter flush partly failed: {e.details.get('writeErrors')}")
+        except Exception as e:
+            # keep the counts for the next flush rather than dropping them
+            print(f"View counter flush failed, will retry: {e}")
+            with self._lock:
+                self._pending.update(batch)
+            return 0
+        return len(ops)
+
+
+view_counter = ViewCounter()
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from src.models.schemas import ContactMessage
 from src.database.connection import get_db
 from src.utils.email_sender import send_email
+from src.utils.rate_limit import RateLimit, client_ip
+from src.events.bus import publish_local
 from datetime import datetime
 from pydantic import BaseModel
 from bson import ObjectId
 
 router = APIRouter()
 
+CONTACT_IP_LIMIT = RateLimit("contact-ip", capacity=5, per_seconds=600)
+
 
 class EmailReply(BaseModel):
     message_id: str
@@ -16,10 +20,11 @@ class EmailReply(BaseModel):
 
 
 @router.post("/submit")
-def submit_contact_message(message: ContactMessage, db=Depends(get_db)):
+def submit_contact_message(message: ContactMessage, request: Request, db=Depends(get_db)):
     """
     Receive and store contact form submissions
     """
+    CONTACT_IP_LIMIT.check(client_ip(request))
     try:
         # Create message document
         message_doc = {
@@ -33,6 +38,7 @@ def submit_contact_message(message: ContactMessage, db=Depends(get_db)):
         
         # Insert into database
         result = db.contact_messages.insert_one(message_doc)
+        publish_local("contact.created", {"id": str(result.inserted_id)})
         
         return {
             "success": True,
@@ -1,27 +1,64 @@
 from pymongo import MongoClient
 from pymongo.errors import ConfigurationError, ConnectionFailure
+from pymongo.read_preferences import SecondaryPreferred
+from bson.timestamp import Timestamp
+import hashlib
+import hmac
 import os
+import secrets
 import sys
+import time
 from dotenv import load_dotenv
-from fastapi import HTTPException
+from fastapi import HTTPException, Request, Response
 
 load_dotenv()
 
 MONGO_URI = os.getenv("DATABASE_URL")
 DB_NAME = os.getenv("MONGO_DB_NAME")
+# public reads may go to secondaries that lag at most this much (MongoDB minimum is 90)
+READ_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_READ_MAX_STALENESS", "90"))
+READ_FROM_SECONDARIES = os.getenv("MONGO_READ_FROM_SECONDARIES", "true").lower() != "false"
+
+# returned after admin writes; send it back so later reads see the write
+CAUSAL_TOKEN_HEADER = "X-Causal-Token"
+# tokens are signed so clients cannot make reads wait for a made-up cluster
+# time; without JWT_SECRET_KEY they only verify on the worker that issued them
+_CAUSAL_TOKEN_KEY = (os.getenv("JWT_SECRET_KEY") or secrets.token_hex(32)).encode()
+# reject tokens claiming a cluster time further than this ahead of our clock
+CAUSAL_TOKEN_MAX_SKEW_SECONDS = 30
+# after a connection failure, public reads skip the database for this long
+# instead of each waiting out serverSelectionTimeoutMS
+DB_CIRCUIT_OPEN_SECONDS = int(os.getenv("DB_CIRCUIT_OPEN_SECONDS", "30"))
 
 client = None
 db = None
+read_db = None
+
+class DatabaseUnavailable(HTTPException):
+    pass
+
+# errors meaning "no database right now", as opposed to a bad query
+DB_UNAVAILABLE_ERRORS = (DatabaseUnavailable, ConnectionFailure)
 
 class MockDB:
     def __getattr__(self, name):
-        # This will be called when code tries to access db.users, db.blogs, etc.
-        # We verify connection lazily or just fail.
-        return self._do_raise
+        # This will be called when code tries to access db.users, db.blogs.find, etc.
+        # Every lookup resolves to the mock itself so that the call fails cleanly.
+        return self
+
+    def __getitem__(self, name):
+        return self
 
-    def _do_raise(self, *args, **kwargs):
+    def __call__(self, *args, **kwargs):
         print("Blocked DB Error: Database connection is missing/invalid.")
-        raise HTTPException(status_code=500, detail="Database connection is invalid. Please check backend logs and .env file.")
+        raise DatabaseUnavailable(status_code=500, detail="Database connection is invalid. Please check backend logs and .env file.")
+
+class _CircuitOpenDB(MockDB):
+    def __call__(self, *args, **kwargs):
+        raise DatabaseUnavailable(status_code=503, detail="Database temporarily unavailable")
+
+_circuit_open_db = _CircuitOpenDB()
+_circuit_open_until = 0.0
 
 try:
     if not MONGO_URI or not DB_NAME:
@@ -32,6 +69,11 @@ try:
         client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
         # We won't force a ping here to allow 'lazy' startup, but SRV resolution happens now.
         db = client[DB_NAME]
+        if READ_FROM_SECONDARIES:
+            read_db = client.get_database(
+                DB_NAME,
+                read_preference=SecondaryPreferred(max_staleness=READ_MAX_STALENESS_SECONDS),
+            )
 except (ConfigurationError, ConnectionFailure, Exception) as e:
     print(f"!!! CRITICAL DATABASE ERROR !!!")
     print(f"Could not connect to MongoDB: {e}")
@@ -39,6 +81,59 @@ except (ConfigurationError, ConnectionFailure, Exception) as e:
     print(f"Please update D:\\Projects\\My personal Website\\My-personal-website-Backend-\\.env with a correct DATABASE_URL.")
     db = MockDB()
 
-# FastAPI dependency
+if read_db is None:
+    read_db = db
+
+# FastAPI dependency: primary, for writes and admin paths
 def get_db():
     return db
+
+# FastAPI dependency: secondary-preferred, for public cacheable reads.
+# While the circuit is open this fails fast so callers use their fallback.
+def get_read_db():
+    if time.monotonic() < _circuit_open_until:
+        return _circuit_open_db
+    return read_db
+
+def open_db_circuit():
+    """Mark the database as down for DB_CIRCUIT_OPEN_SECONDS."""
+    global _circuit_open_until
+    if time.monotonic() >= _circuit_open_until:
+        print(f"Database unreachable, skipping public reads for {DB_CIRCUIT_OPEN_SECONDS}s")
+    _circuit_open_until = time.monotonic() + DB_CIRCUIT_OPEN_SECONDS
+
+def _sign_causal_token(seconds: int, increment: int) -> str:
+    message = f"{seconds}.{increment}".encode()
+    return hmac.new(_CAUSAL_TOKEN_KEY, message, hashlib.sha256).hexdigest()[:32]
+
+def _parse_causal_token(token: str):
+    """Return the Timestamp in a token we issued, or None if it is forged or implausible."""
+    try:
+        seconds, increment, signature = token.split(".", 2)
+        seconds, increment = int(seconds), int(increment)
+    except (ValueError, TypeError):
+        return None
+    if not hmac.compare_digest(signature, _sign_causal_token(seconds, increment)):
+        return None
+    if seconds > time.time() + CAUSAL_TOKEN_MAX_SKEW_SECONDS:
+        return None
+    return Timestamp(seconds, increment)
+
+# FastAPI dependency: causally consistent session (None without a database).
+# If the client sends the token from an earlier write, reads made with this
+# session wait until the node they hit has caught up with that write.
+def get_session(request: Request):
+    if client is None:
+        yield None
+        return
+    with client.start_session(causal_consistency=True) as session:
+        token = request.headers.get(CAUSAL_TOKEN_HEADER)
+        operation_time = _parse_causal_token(token) if token else None
+        if operation_time:
+            session.advance_operation_time(operation_time)
+        yield session
+
+def set_causal_token(response: Response, session):
+    if session is not None and session.operation_time is not None:
+        op = session.operation_time
+        response.headers[CAUSAL_TOKEN_HEADER] = f"{op.time}.{op.inc}.{_sign_causal_token(op.time, op.inc)}"
@@ -0,0 +1,149 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from bson import json_util
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SNAPSHOT_PATH = Path(os.getenv("SNAPSHOT_PATH", "public_snapshot.bin"))
+
+# File layout:
+#   post payloads (Extended JSON, back to back)
+#   index (JSON: generated_at, types, blog_types, posts=[[id, type, views, offset, length], ...])
+#   footer: MAGIC + little-endian u64 index offset + u64 index length
+# Posts are listed newest first. Readers mmap the file and decode only the
+# posts a request needs.
+MAGIC = b"BSNAP001"
+_FOOTER = struct.Struct("<8sQQ")
+
+
+def write_snapshot(db, path: Path = SNAPSHOT_PATH):
+    """Stream public data from db into a new snapshot file and swap it in atomically."""
+    tmp = path.with_name(path.name + ".tmp")
+    entries = []
+    blog_types = set()
+    with tmp.open("wb") as f:
+        offset = 0
+        for doc in db.blogs.find({}).sort("created_at", -1):
+            payload = json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS).encode("utf-8")
+            f.write(payload)
+            entries.append([str(doc["_id"]), doc.get("type"), doc.get("views", 0), offset, len(payload)])
+            offset += len(payload)
+            if doc.get("type"):
+                blog_types.add(doc["type"])
+
+        types = [
+            {"id": str(d["_id"]), "name": d["name"], "image": d.get("image")}
+            for d in db.types.find().sort("name", 1)
+        ]
+        index = json.dumps({
+            "generated_at": datetime.utcnow().isoformat(),
+            "types": types,
+            "blog_types": sorted(blog_types),
+            "posts": entries,
+        }).encode("utf-8")
+        f.write(index)
+        f.write(_FOOTER.pack(MAGIC, offset, len(index)))
+
+    if os.name == "nt":
+        # a mapped file cannot be replaced on Windows, so let go of ours first
+        public_snapshot.close()
+    os.replace(tmp, path)
+    print(f"Wrote public snapshot with {len(entries)} posts to {path}")
+
+
+class SnapshotData:
+    """One mapped snapshot file. Only the posts a request needs are decoded."""
+
+    def __init__(self, mapped, index):
+        self._map = mapped
+        self.generated_at = datetime.fromisoformat(index["generated_at"])
+        self.types = index["types"]
+        self.blog_types = index["blog_types"]
+        self.posts = index["posts"]
+        self._by_id = {entry[0]: entry for entry in self.posts}
+
+    def close(self):
+        self._map.close()
+
+    def age_seconds(self) -> int:
+        return int((datetime.utcnow() - self.generated_at).total_seconds())
+
+    def _decode(self, entry):
+        _, _, _, offset, length = entry
+        return json_util.loads(self._map[offset:offset + length])
+
+    def get_post(self, blog_id: str):
+        entry = self._by_id.get(blog_id)
+        return self._decode(entry) if entry else None
+
+    def list_posts(self, type: str = None, skip: int = 0, limit: int = 100, sort: str = "latest"):
+        """Return (total, docs) like list_blogs."""
+        entries = self.posts
+        if type:
+            entries = [e for e in entries if e[1] == type]
+        if sort == "popular":
+            entries = sorted(entries, key=lambda e: -e[2])
+        return len(entries), [self._decode(e) for e in entries[skip:skip + limit]]
+
+    def iter_posts(self):
+        for entry in self.posts:
+            yield self._decode(entry)
+
+
+class Snapshot:
+    """Gives out the current SnapshotData, remapping when the file is replaced."""
+
+    def __init__(self, path: Path = SNAPSHOT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = None
+        self._stamp = None
+
+    def close(self):
+        with self._lock:
+            if self._data is not None:
+                self._data.close()
+            self._data = self._stamp = None
+
+    def current(self):
+        """Return the latest SnapshotData, or None if there is no valid snapshot."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return self._data
+
+        with self._lock:
+            if stamp != self._stamp:
+                # requests still holding the previous data keep its mapping alive
+                self._data, self._stamp = self._open(), stamp
+            return self._data
+
+    def _open(self):
+        if self.path.stat().st_size < _FOOTER.size:
+            print(f"Ignoring truncated snapshot {self.path}")
+            return None
+        with self.path.open("rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, index_offset, index_length = _FOOTER.unpack(mapped[-_FOOTER.size:])
+            if magic != MAGIC:
+                raise ValueError("bad magic")
+            index = json.loads(mapped[index_offset:index_offset + index_length])
+            return SnapshotData(mapped, index)
+        except (ValueError, KeyError, struct.error) as e:
+            mapped.close()
+            print(f"Ignoring unreadable snapshot {self.path}: {e}")
+            return None
+
+
+public_snapshot = Snapshot()
@@ -0,0 +1,149 @@
+import asyncio
+import secrets
+import threading
+import time
+from collections import deque
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+# events kept for clients reconnecting with Last-Event-ID
+HISTORY_SIZE = 200
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# change stream operations we turn into events, per collection
+_WATCHED = {"blogs": "blog", "contact_messages": "contact"}
+_ACTIONS = {"insert": "created", "update": "updated", "replace": "updated", "delete": "deleted"}
+
+# fields an autosave writes; it always sets autosaved_at, which is how its
+# updates are told apart from a full edit that only changed the content
+_AUTOSAVE_FIELDS = {"autosaved_at", "content", "updated_at", "version"}
+
+# server error code for $changeStream on a standalone mongod
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+
+class EventBus:
+    """
+    Fan events out to SSE subscribers. publish() may be called from any
+    thread; each subscriber is an asyncio.Queue fed on its own event loop.
+
+    Event ids are "<epoch>-<n>" where the epoch is random per process, so a
+    Last-Event-ID issued by another worker or before a restart is ignored
+    instead of being compared against an unrelated counter.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=HISTORY_SIZE)
+        self._next_id = 1
+        self.epoch = secrets.token_hex(4)
+
+    def publish(self, event_type: str, data: dict):
+        with self._lock:
+            event = {"id": f"{self.epoch}-{self._next_id}", "seq": self._next_id, "event": event_type, "data": data}
+            self._next_id += 1
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # the subscriber's loop is closed; it unsubscribes on its own
+                pass
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers = {s for s in self._subscribers if s[1] is not queue}
+
+    def since(self, last_event_id: str):
+        """Events after last_event_id, or [] if it is not one of ours."""
+        epoch, _, seq = (last_event_id or "").partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return []
+        with self._lock:
+            return [e for e in self._history if e["seq"] > int(seq)]
+
+
+def _offer(queue, event):
+    # a client that cannot keep up misses events instead of blocking everyone
+    if not queue.full():
+        queue.put_nowait(event)
+
+
+event_bus = EventBus()
+
+_change_stream_active = threading.Event()
+_stop = threading.Event()
+
+
+def publish_local(event_type: str, data: dict):
+    """
+    Publish an event raised by this process. Skipped while the change stream
+    watcher runs, since it already reports every write from all workers.
+    """
+    if not _change_stream_active.is_set():
+        event_bus.publish(event_type, data)
+
+
+def _event_from_change(change):
+    coll = change["ns"]["coll"]
+    op = change["operationType"]
+    if op == "update":
+        fields = change.get("updateDescription", {}).get("updatedFields", {})
+        # buffered view counts are flushed every few seconds; not a content change
+        if set(fields) <= {"views"}:
+            return None
+        # autosaves arrive every few seconds while typing; a new title is still announced
+        if "autosaved_at" in fields and set(fields) <= _AUTOSAVE_FIELDS:
+            return None
+    return f"{_WATCHED[coll]}.{_ACTIONS[op]}", {"id": str(change["documentKey"]["_id"])}
+
+
+def _watch(db):
+    pipeline = [{"$match": {
+        "ns.coll": {"$in": list(_WATCHED)},
+        "operationType": {"$in": list(_ACTIONS)},
+    }}]
+    resume_token = None
+    while not _stop.is_set():
+        try:
+            with db.watch(pipeline, resume_after=resume_token, max_await_time_ms=1000) as stream:
+                _change_stream_active.set()
+                while not _stop.is_set() and stream.alive:
+                    change = stream.try_next()
+                    resume_token = stream.resume_token
+                    if change is None:
+                        continue
+                    event = _event_from_change(change)
+                    if event:
+                        event_bus.publish(*event)
+        except OperationFailure as e:
+            _change_stream_active.clear()
+            if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                print(f"Change streams unavailable, using in-process events: {e}")
+                return
+            # e.g. the resume token fell off the oplog: start from now
+            print(f"Change stream failed, restarting: {e}")
+            resume_token = None
+            time.sleep(5)
+        except PyMongoError as e:
+            print(f"Change stream interrupted, retrying: {e}")
+            _change_stream_active.clear()
+            time.sleep(5)
+    _change_stream_active.clear()
+
+
+def start_change_stream_watcher(db):
+    _stop.clear()
+    threading.Thread(target=_watch, args=(db,), name="change-stream", daemon=True).start()
+
+
+def stop_change_stream_watcher():
+    _stop.set()
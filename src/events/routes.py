@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from src.auth.deps import get_current_user
+from src.database.connection import get_db
+from src.events.bus import event_bus
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = 15
+PUBLIC_TOPICS = {"blog"}
+ADMIN_TOPICS = {"contact"}
+
+
+def _format(event):
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+async def _event_stream(request: Request, topics: set, last_event_id):
+    queue = event_bus.subscribe()
+    try:
+        yield "retry: 5000\n\n"
+        # a reconnecting client gets what it missed while it was away
+        if last_event_id is not None:
+            for event in event_bus.since(last_event_id):
+                if event["event"].split(".")[0] in topics:
+                    yield _format(event)
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            if event["event"].split(".")[0] in topics:
+                yield _format(event)
+    finally:
+        event_bus.unsubscribe(queue)
+
+
+@router.get("/stream")
+def stream_events(request: Request, topics: str = "blog", token: str = None, db=Depends(get_db)):
+    """
+    Server-Sent Events with compact change notifications, e.g.
+    `event: blog.updated` / `data: {"id": "..."}`. Topics: blog, contact.
+    The contact topic is admin only; EventSource cannot send headers, so the
+    access token is passed as ?token=.
+    """
+    requested = {t.strip() for t in topics.split(",") if t.strip()}
+    unknown = requested - PUBLIC_TOPICS - ADMIN_TOPICS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown topics: {', '.join(sorted(unknown))}")
+    if requested & ADMIN_TOPICS:
+        if not token:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        user = get_current_user(token, db)
+        if user.get("role") != "admin":
+            raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    return StreamingResponse(
+        _event_stream(request, requested, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
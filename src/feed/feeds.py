@@ -0,0 +1,185 @@
+import hashlib
+import html
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SITE_URL = os.getenv("SITE_URL", "http://localhost:5173").rstrip("/")
+POST_URL_TEMPLATE = os.getenv("POST_URL_TEMPLATE", SITE_URL + "/blog/{id}")
+FEED_TITLE = os.getenv("FEED_TITLE", "Concepts Blog")
+FEED_SIZE = 20
+SUMMARY_LENGTH = 300
+
+# other workers do not see our invalidations, so re-render at least this often
+FEED_MAX_AGE_SECONDS = int(os.getenv("FEED_MAX_AGE_SECONDS", "600"))
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+class RenderedDocument:
+    def __init__(self, body: bytes, media_type: str, last_modified: datetime):
+        self.body = body
+        self.media_type = media_type
+        self.last_modified = last_modified
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+_cache = {}
+# last document handed out per name, kept across invalidations so an
+# unchanged re-render keeps its Last-Modified
+_published = {}
+_rendered_at = 0.0
+# bumped by every invalidation; a render that started under an older
+# generation may have read pre-write data and is not cached
+_generation = 0
+_lock = threading.Lock()
+_generation_lock = threading.Lock()
+
+
+def _post_url(doc):
+    return escape(POST_URL_TEMPLATE.format(id=str(doc["_id"])))
+
+
+def _as_utc(dt):
+    dt = dt or datetime.utcnow()
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+def _summary(content):
+    text = html.unescape(_TAG_RE.sub(" ", content or ""))
+    text = " ".join(text.split())
+    return text if len(text) <= SUMMARY_LENGTH else text[:SUMMARY_LENGTH].rsplit(" ", 1)[0] + "..."
+
+
+def _modified_at(posts):
+    stamps = [_as_utc(d.get("updated_at") or d.get("created_at")) for d in posts]
+    return max(stamps).replace(microsecond=0) if stamps else datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _document(name, body, media_type, modified_at):
+    document = RenderedDocument(body, media_type, modified_at)
+    previous = _published.get(name)
+    if previous is not None:
+        if previous.etag == document.etag:
+            document.last_modified = previous.last_modified
+        elif document.last_modified <= previous.last_modified:
+            # content changed without a newer timestamp, e.g. a post was deleted
+            document.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+    _published[name] = document
+    return document
+
+
+def render_rss(posts, built_at):
+    items = []
+    for doc in posts:
+        categories = [doc.get("type")] + list(doc.get("tags") or [])
+        items.append(
+            "<item>"
+            f"<title>{escape(doc.get('title') or '')}</title>"
+            f"<link>{_post_url(doc)}</link>"
+            f"<guid isPermaLink=\"false\">{doc['_id']}</guid>"
+            f"<pubDate>{format_datetime(_as_utc(doc.get('created_at')))}</pubDate>"
+            f"<description>{escape(_summary(doc.get('content')))}</description>"
+            + "".join(f"<category>{escape(c)}</category>" for c in categories if c)
+            + "</item>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0"><channel>'
+        f"<title>{escape(FEED_TITLE)}</title>"
+        f"<link>{escape(SITE_URL)}</link>"
+        f"<description>{escape(FEED_TITLE)}</description>"
+        f"<lastBuildDate>{format_datetime(built_at)}</lastBuildDate>"
+        + "".join(items)
+        + "</channel></rss>\n"
+    ).encode("utf-8")
+
+
+def render_sitemap(posts):
+    urls = [f"<url><loc>{escape(SITE_URL)}/</loc></url>"]
+    for doc in posts:
+        lastmod = _as_utc(doc.get("updated_at") or doc.get("created_at")).strftime("%Y-%m-%d")
+        urls.append(f"<url><loc>{_post_url(doc)}</loc><lastmod>{lastmod}</lastmod></url>")
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        + "".join(urls)
+        + "</urlset>\n"
+    ).encode("utf-8")
+
+
+def _render_all(db):
+    latest = list(
+        db.blogs.find({}, {"title": 1, "content": 1, "tags": 1, "type": 1, "created_at": 1, "updated_at": 1})
+        .sort("created_at", -1)
+        .limit(FEED_SIZE)
+    )
+    everything = list(db.blogs.find({}, {"created_at": 1, "updated_at": 1}).sort("created_at", -1))
+    return _render(latest, everything)
+
+
+def _render(latest, everything):
+    """Render both documents. Dates come from the posts, so unchanged data renders identical bytes."""
+    feed_modified = _modified_at(latest)
+    return {
+        "feed": _document("feed", render_rss(latest, feed_modified), "application/rss+xml", feed_modified),
+        "sitemap": _document("sitemap", render_sitemap(everything), "application/xml", _modified_at(everything)),
+    }
+
+
+def _install(documents, generation, age_seconds=0):
+    """Cache documents unless an invalidation happened since their render started."""
+    global _cache, _rendered_at
+    with _generation_lock:
+        if generation == _generation:
+            _cache = documents
+            _rendered_at = time.monotonic() - age_seconds
+
+
+def _fresh(cache, name):
+    return name in cache and time.monotonic() - _rendered_at <= FEED_MAX_AGE_SECONDS
+
+
+def get_document(name: str, db) -> RenderedDocument:
+    """Return the pre-rendered document, rendering only after a change."""
+    cache = _cache
+    if _fresh(cache, name):
+        return cache[name]
+    with _lock:
+        cache = _cache
+        if not _fresh(cache, name):
+            generation = _generation
+            cache = _render_all(db)
+            _install(cache, generation)
+    return cache[name]
+
+
+def warm_feeds(snapshot):
+    """
+    Render from a public snapshot (newest first) so the first requests need
+    no database. The documents count as rendered when the snapshot was
+    written, so an old snapshot is skipped and a recent one expires on time.
+    """
+    age = snapshot.age_seconds()
+    if age > FEED_MAX_AGE_SECONDS:
+        return
+    with _lock:
+        generation = _generation
+        posts = list(snapshot.iter_posts())
+        _install(_render(posts[:FEED_SIZE], posts), generation, age)
+
+
+def invalidate_feeds():
+    """Drop the rendered feed and sitemap; the next request renders them again."""
+    global _cache, _generation
+    with _generation_lock:
+        _generation += 1
+        _cache = {}
@@ -0,0 +1,41 @@
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import APIRouter, Depends, Request, Response
+from src.database.connection import get_db
+from src.feed.feeds import get_document
+
+router = APIRouter()
+
+
+def _not_modified(request: Request, document) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return document.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return document.last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _serve(name: str, request: Request, db):
+    document = get_document(name, db)
+    headers = {
+        "ETag": document.etag,
+        "Last-Modified": format_datetime(document.last_modified, usegmt=True),
+        "Cache-Control": "public, max-age=300",
+    }
+    if _not_modified(request, document):
+        return Response(status_code=304, headers=headers)
+    return Response(content=document.body, media_type=document.media_type, headers=headers)
+
+
+@router.get("/feed.xml")
+def rss_feed(request: Request, db=Depends(get_db)):
+    return _serve("feed", request, db)
+
+
+@router.get("/sitemap.xml")
+def sitemap(request: Request, db=Depends(get_db)):
+    return _serve("sitemap", request, db)
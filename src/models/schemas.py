@@ -23,3 +23,22 @@ class ContactMessage(BaseModel):
     email: EmailStr
     subject: str
     message: str
+
+
+class TextEdit(BaseModel):
+    # Replace content[start:end] with text. Positions are UTF-16 code units in
+    # the base version, i.e. JavaScript string indices.
+    start: int
+    end: int
+    text: str = ""
+
+
+class BlogAutosave(BaseModel):
+    version: int
+    edits: List[TextEdit] = []
+    title: Optional[str] = None
+
+
+class BlogBatchRequest(BaseModel):
+    ids: List[str]
+    fields: Optional[List[str]] = None
@@ -0,0 +1,69 @@
+import os
+from datetime import timedelta
+
+from src.database.connection import client, get_db, get_read_db
+from src.database.snapshot import public_snapshot, write_snapshot
+from src.feed.feeds import warm_feeds
+from src.utils.background import run_periodically, stop_all
+from src.utils.image_gc import collect_orphaned_images
+from src.blog.related import related_index
+from src.blog.view_counter import FLUSH_INTERVAL_SECONDS, ensure_view_indexes, view_counter
+from src.events.bus import start_change_stream_watcher, stop_change_stream_watcher
+
+
+def _interval(name: str, default: float = 0):
+    # 0 disables a job; most jobs are opt-in and default to 0
+    value = float(os.getenv(name, str(default)) or 0)
+    return value if value > 0 else None
+
+
+def start_background_tasks():
+    db = get_db()
+
+    # serve the feed from the last snapshot until the database has been reached
+    snapshot = public_snapshot.current()
+    if snapshot is not None:
+        try:
+            warm_feeds(snapshot)
+        except Exception as e:
+            print(f"Could not warm feeds from snapshot: {e}")
+
+    try:
+        ensure_view_indexes(db)
+    except Exception as e:
+        print(f"Could not create view indexes: {e}")
+    if FLUSH_INTERVAL_SECONDS > 0:
+        run_periodically("view-flush", FLUSH_INTERVAL_SECONDS, lambda: view_counter.flush(db))
+
+    # falls back to in-process events by itself if the server has no change streams
+    if client is not None and os.getenv("CHANGE_STREAMS_ENABLED", "true").lower() != "false":
+        start_change_stream_watcher(db)
+
+    gc_interval = _interval("IMAGE_GC_INTERVAL_SECONDS")
+    if gc_interval:
+        dry_run = os.getenv("IMAGE_GC_DRY_RUN", "true").lower() != "false"
+        grace = timedelta(hours=float(os.getenv("IMAGE_GC_GRACE_HOURS", "24")))
+        run_periodically(
+            "image-gc",
+            gc_interval,
+            lambda: collect_orphaned_images(db, dry_run=dry_run, grace_period=grace),
+        )
+
+    # build right away so related lists exist on a fresh deploy, then refresh
+    # the vocabulary and IDF weights the incremental updates rely on
+    related_interval = _interval("RELATED_REBUILD_INTERVAL_SECONDS", default=3600)
+    if related_interval and client is not None:
+        run_periodically("related-rebuild", related_interval, lambda: related_index.rebuild(db), run_now=True)
+
+    # the snapshot is what public reads fall back to when the database is
+    # down, so it is on by default; 0 turns it off
+    snapshot_interval = _interval("SNAPSHOT_INTERVAL_SECONDS", default=300)
+    if snapshot_interval and client is not None:
+        run_periodically("public-snapshot", snapshot_interval, lambda: write_snapshot(get_read_db()))
+
+
+def stop_background_tasks():
+    stop_all()
+    stop_change_stream_watcher()
+    # write out views buffered since the last periodic flush
+    view_counter.flush(get_db())
@@ -0,0 +1,38 @@
+import threading
+
+# (name, stop event, thread) for every running periodic task
+_tasks = []
+
+
+def run_periodically(name: str, interval_seconds: float, func, run_now: bool = False):
+    """
+    Call func every interval_seconds on a daemon thread until stop_all().
+    With run_now the first call happens immediately instead of after one
+    interval. Errors are logged and the task keeps running.
+    """
+    stop = threading.Event()
+
+    def run():
+        try:
+            func()
+        except Exception as e:
+            print(f"Background task {name} failed: {e}")
+
+    def loop():
+        if run_now:
+            run()
+        while not stop.wait(interval_seconds):
+            run()
+
+    thread = threading.Thread(target=loop, name=name, daemon=True)
+    thread.start()
+    _tasks.append((name, stop, thread))
+    print(f"Started background task {name} (every {interval_seconds}s)")
+
+
+def stop_all(timeout: float = 5):
+    for _, stop, _ in _tasks:
+        stop.set()
+    for _, _, thread in _tasks:
+        thread.join(timeout)
+    _tasks.clear()
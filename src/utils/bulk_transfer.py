@@ -0,0 +1,137 @@
+from bson import json_util
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+# collections that can be moved with export/import
+TRANSFER_COLLECTIONS = ("blogs", "types")
+
+EXPORT_BATCH_SIZE = 500
+IMPORT_BATCH_SIZE = 500
+
+# keep the error report small when a whole file is malformed
+MAX_REPORTED_ERRORS = 100
+
+
+def export_ndjson(db, collections=TRANSFER_COLLECTIONS):
+    """
+    Yield one NDJSON line per document: {"collection": ..., "doc": ...}.
+    Documents are streamed from the cursor, so memory use does not grow
+    with the size of the collection.
+    """
+    for name in collections:
+        cursor = getattr(db, name).find({}, batch_size=EXPORT_BATCH_SIZE).sort("_id", 1)
+        for doc in cursor:
+            yield json_util.dumps(
+                {"collection": name, "doc": doc},
+                json_options=json_util.RELAXED_JSON_OPTIONS,
+            ) + "\n"
+
+
+def _write_op(name, doc):
+    """
+    Upsert on the natural key so re-running or resuming an import is
+    idempotent. Returns None for a document without one; inserting it would
+    create a duplicate every time the import is resumed.
+    """
+    if "_id" in doc:
+        return ReplaceOne({"_id": doc["_id"]}, doc, upsert=True)
+    if name == "types" and doc.get("name"):
+        return ReplaceOne({"name": doc["name"]}, doc, upsert=True)
+    return None
+
+
+def import_ndjson(db, lines, batch_size=IMPORT_BATCH_SIZE, start_line=0, on_checkpoint=None):
+    """
+    Import NDJSON lines produced by export_ndjson.
+
+    Writes are batched per collection with an unordered bulk_write. Lines up
+    to start_line are skipped so an interrupted import can resume; after every
+    batch on_checkpoint(line_number) is called with the last line that is
+    safely written.
+
+    If the database fails mid-import (connection loss, timeout) the import
+    stops and the stats are returned with status "partial", the error, and
+    the checkpoint to resume from. Otherwise status is "complete".
+    """
+    pending = {name: [] for name in TRANSFER_COLLECTIONS}
+    stats = {
+        "processed": 0,
+        "inserted": 0,
+        "upserted": 0,
+        "modified": 0,
+        "errors": [],
+        "checkpoint": start_line,
+        "status": "complete",
+    }
+
+    def add_error(line_no, message):
+        if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+            stats["errors"].append({"line": line_no, "error": message})
+
+    def flush(line_no):
+        for name, ops in pending.items():
+            if not ops:
+                continue
+            try:
+                result = getattr(db, name).bulk_write(ops, ordered=False)
+                details = result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                for err in details.get("writeErrors", []):
+                    add_error(None, f"{name}: {err.get('errmsg')}")
+            stats["inserted"] += details.get("nInserted", 0)
+            stats["upserted"] += details.get("nUpserted", 0)
+            stats["modified"] += details.get("nModified", 0)
+            ops.clear()
+        stats["checkpoint"] = line_no
+        if on_checkpoint:
+            on_checkpoint(line_no)
+
+    def stop(e):
+        # lines after the checkpoint are written again on resume, which the
+        # upserts make safe
+        stats["status"] = "partial"
+        stats["error"] = str(e)
+        return stats
+
+    line_no = start_line
+    queued = 0
+    for line_no, raw in enumerate(lines, start=1):
+        if line_no <= start_line:
+            continue
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        raw = raw.strip()
+        if not raw:
+            continue
+
+        try:
+            record = json_util.loads(raw)
+            name = record["collection"]
+            doc = record["doc"]
+        except (ValueError, KeyError, TypeError) as e:
+            add_error(line_no, f"Malformed line: {e}")
+            continue
+        if name not in pending or not isinstance(doc, dict):
+            add_error(line_no, f"Unknown collection: {name}")
+            continue
+
+        op = _write_op(name, doc)
+        if op is None:
+            add_error(line_no, f"{name}: document has no _id")
+            continue
+        pending[name].append(op)
+        stats["processed"] += 1
+        queued += 1
+        if queued >= batch_size:
+            try:
+                flush(line_no)
+            except PyMongoError as e:
+                return stop(e)
+            queued = 0
+
+    try:
+        flush(line_no)
+    except PyMongoError as e:
+        return stop(e)
+    return stats
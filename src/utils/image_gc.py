@@ -0,0 +1,176 @@
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import cloudinary
+import cloudinary.api
+from cloudinary.exceptions import Error as CloudinaryError
+
+# Cloudinary folders the app uploads into
+IMAGE_FOLDERS = ("concepts_blog", "concepts_type")
+
+# Cloudinary accepts at most 100 public ids per delete_resources call
+DELETE_BATCH_SIZE = 100
+LIST_PAGE_SIZE = 500
+
+# images uploaded from the editor are not referenced until the post is saved,
+# so anything younger than this is never treated as an orphan
+DEFAULT_GRACE_PERIOD = timedelta(hours=24)
+
+# upper bound on deletions per run so one bad scan cannot wipe the library
+DEFAULT_MAX_DELETES = 1000
+
+_CLOUDINARY_URL_RE = re.compile(r"res\.cloudinary\.com/[^\s\"'<>)]+")
+_LOCAL_URL_RE = re.compile(r"/uploads/([\w.\-]+)")
+_VERSION_RE = re.compile(r"^v\d+$")
+
+
+def _cloudinary_configured():
+    return bool(
+        os.environ.get("CLOUDINARY_CLOUD_NAME")
+        and os.environ.get("CLOUDINARY_API_KEY")
+        and os.environ.get("CLOUDINARY_API_SECRET")
+    )
+
+
+def public_id_from_url(url: str):
+    """
+    Extract the public id from a Cloudinary delivery URL, e.g.
+    .../image/upload/v1700000000/concepts_blog/abc.jpg -> concepts_blog/abc
+    """
+    if "/upload/" not in url:
+        return None
+    segments = url.split("/upload/", 1)[1].split("?", 1)[0].split("/")
+    # transformations come before the version segment
+    for i, segment in enumerate(segments):
+        if _VERSION_RE.match(segment):
+            segments = segments[i + 1:]
+            break
+    if not segments:
+        return None
+    segments[-1] = segments[-1].rsplit(".", 1)[0]
+    return "/".join(segments)
+
+
+def _collect_refs(text, cloud_ids, local_files):
+    if not text or not isinstance(text, str):
+        return
+    for match in _CLOUDINARY_URL_RE.finditer(text):
+        public_id = public_id_from_url(match.group(0))
+        if public_id:
+            cloud_ids.add(public_id)
+    for match in _LOCAL_URL_RE.finditer(text):
+        local_files.add(match.group(1))
+
+
+def live_image_refs(db):
+    """
+    Return (cloudinary public ids, local upload filenames) still referenced by
+    blogs (cover and inline content images) or types.
+    """
+    cloud_ids = set()
+    local_files = set()
+    for blog in db.blogs.find({}, {"cover_image": 1, "content": 1, "image_public_id": 1}):
+        _collect_refs(blog.get("cover_image"), cloud_ids, local_files)
+        _collect_refs(blog.get("content"), cloud_ids, local_files)
+        if blog.get("image_public_id"):
+            cloud_ids.add(blog["image_public_id"])
+    for t in db.types.find({}, {"image": 1}):
+        _collect_refs(t.get("image"), cloud_ids, local_files)
+    return cloud_ids, local_files
+
+
+def _list_cloudinary_images(folder):
+    cursor = None
+    while True:
+        kwargs = {"type": "upload", "resource_type": "image", "prefix": f"{folder}/", "max_results": LIST_PAGE_SIZE}
+        if cursor:
+            kwargs["next_cursor"] = cursor
+        page = cloudinary.api.resources(**kwargs)
+        for resource in page.get("resources", []):
+            yield resource
+        cursor = page.get("next_cursor")
+        if not cursor:
+            break
+
+
+def _batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def collect_orphaned_images(
+    db,
+    dry_run: bool = True,
+    upload_dir: Path = Path("uploads"),
+    grace_period: timedelta = DEFAULT_GRACE_PERIOD,
+    max_deletes: int = DEFAULT_MAX_DELETES,
+    pause_seconds: float = 1.0,
+):
+    """
+    Delete images in Cloudinary and upload_dir that nothing references anymore.
+
+    Deletes are batched (one API call per 100 Cloudinary ids) with a pause
+    between batches. With dry_run=True only the report is produced. A batch
+    that fails is listed under "errors" and the run carries on, so the
+    report always says what was actually deleted.
+    """
+    cloud_ids, local_files = live_image_refs(db)
+    cutoff = datetime.utcnow() - grace_period
+    report = {"dry_run": dry_run}
+
+    cloud_report = {"scanned": 0, "orphaned": [], "deleted": 0, "errors": []}
+    if _cloudinary_configured():
+        for folder in IMAGE_FOLDERS:
+            for resource in _list_cloudinary_images(folder):
+                cloud_report["scanned"] += 1
+                created = resource.get("created_at")
+                if created and datetime.strptime(created, "%Y-%m-%dT%H:%M:%SZ") > cutoff:
+                    continue
+                if resource["public_id"] not in cloud_ids:
+                    cloud_report["orphaned"].append(resource["public_id"])
+        orphaned = cloud_report["orphaned"][:max_deletes]
+        if not dry_run:
+            for batch in _batches(orphaned, DELETE_BATCH_SIZE):
+                try:
+                    result = cloudinary.api.delete_resources(batch, resource_type="image")
+                except CloudinaryError as e:
+                    cloud_report["errors"].append({"ids": batch, "error": str(e)})
+                else:
+                    cloud_report["deleted"] += sum(1 for v in result.get("deleted", {}).values() if v == "deleted")
+                time.sleep(pause_seconds)
+    report["cloudinary"] = cloud_report
+
+    local_report = {"scanned": 0, "orphaned": [], "deleted": 0, "errors": []}
+    if upload_dir.exists():
+        for path in upload_dir.iterdir():
+            if not path.is_file():
+                continue
+            local_report["scanned"] += 1
+            if datetime.utcfromtimestamp(path.stat().st_mtime) > cutoff:
+                continue
+            if path.name not in local_files:
+                local_report["orphaned"].append(path.name)
+        orphaned = local_report["orphaned"][:max_deletes]
+        if not dry_run:
+            for batch in _batches(orphaned, DELETE_BATCH_SIZE):
+                for name in batch:
+                    try:
+                        (upload_dir / name).unlink()
+                        local_report["deleted"] += 1
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        local_report["errors"].append({"ids": [name], "error": str(e)})
+                time.sleep(pause_seconds)
+    report["local"] = local_report
+
+    print(
+        f"Image GC ({'dry run' if dry_run else 'live'}): "
+        f"{len(cloud_report['orphaned'])} Cloudinary and {len(local_report['orphaned'])} local orphans, "
+        f"{cloud_report['deleted'] + local_report['deleted']} deleted, "
+        f"{len(cloud_report['errors']) + len(local_report['errors'])} failed batches"
+    )
+    return report
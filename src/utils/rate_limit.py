@@ -0,0 +1,179 @@
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, Request
+from pymongo import ReturnDocument
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "memory" keeps buckets per worker, "mongo" shares them across workers
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() != "false"
+# Number of trusted reverse proxies in front of the app (e.g. 1 on Vercel).
+# 0 (the default) ignores X-Forwarded-For, which any client can forge.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+
+class MemoryBucketStore:
+    """Token buckets kept in this process. Idle buckets are pruned once full."""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> (tokens, updated_at, full_at)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, refill_per_second: float):
+        """Take one token. Returns (allowed, seconds until a token is available)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            full_at = now + (capacity - tokens) / refill_per_second
+            self._buckets[key] = (tokens, now, full_at)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return allowed, 0 if allowed else (1 - tokens) / refill_per_second
+
+    def peek(self, key: str, capacity: int, refill_per_second: float):
+        """Like take() but without consuming a token."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (capacity, now, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+        return tokens >= 1, 0 if tokens >= 1 else (1 - tokens) / refill_per_second
+
+    def _prune(self, now):
+        # a full bucket is the same as no bucket, so it can be dropped
+        self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+        if len(self._buckets) > self.max_keys:
+            keep = list(self._buckets.items())[len(self._buckets) // 2:]
+            self._buckets = dict(keep)
+
+
+class MongoBucketStore:
+    """
+    Token buckets in the rate_limits collection, shared by all workers.
+    Each take is one atomic find_one_and_update; a TTL index removes idle buckets.
+    """
+
+    def __init__(self, db):
+        self.collection = db.rate_limits
+        self._indexed = False
+
+    def take(self, key: str, capacity: int, refill_per_second: float):
+        if not self._indexed:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexed = True
+
+        now = datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed, refill_per_second]}]}]}
+        bucket = self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {
+                    "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "expires_at": now + timedelta(seconds=capacity / refill_per_second),
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if bucket["allowed"]:
+            return True, 0
+        return False, (1 - bucket["tokens"]) / refill_per_second
+
+    def peek(self, key: str, capacity: int, refill_per_second: float):
+        bucket = self.collection.find_one({"_id": key})
+        if not bucket:
+            return True, 0
+        elapsed = (datetime.utcnow() - bucket["updated_at"]).total_seconds()
+        tokens = min(capacity, bucket["tokens"] + elapsed * refill_per_second)
+        return tokens >= 1, 0 if tokens >= 1 else (1 - tokens) / refill_per_second
+
+
+_memory_store = MemoryBucketStore()
+_mongo_store = None
+
+
+def _store():
+    global _mongo_store
+    if RATE_LIMIT_BACKEND == "mongo":
+        if _mongo_store is None:
+            from src.database.connection import get_db
+            _mongo_store = MongoBucketStore(get_db())
+        return _mongo_store
+    return _memory_store
+
+
+def client_ip(request: Request) -> str:
+    if TRUSTED_PROXY_HOPS > 0:
+        # each trusted proxy appends the address it received the request from,
+        # so only the last TRUSTED_PROXY_HOPS entries are trustworthy; anything
+        # further left was supplied by the client
+        forwarded = [a.strip() for a in request.headers.get("x-forwarded-for", "").split(",") if a.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimit:
+    """
+    Allow `capacity` requests in a burst, refilled evenly over `per_seconds`.
+    check() raises 429 with a Retry-After header when the bucket is empty.
+
+    For limits that should only count failures, call ensure_available()
+    before the work and charge() once it has failed.
+    """
+
+    def __init__(self, name: str, capacity: int, per_seconds: float):
+        self.name = name
+        self.capacity = capacity
+        self.refill_per_second = capacity / per_seconds
+
+    def _call(self, method: str, key: str):
+        bucket_key = f"{self.name}:{key}"
+        try:
+            return getattr(_store(), method)(bucket_key, self.capacity, self.refill_per_second)
+        except Exception as e:
+            # never lock everyone out because the shared store is down
+            print(f"Rate limit store failed, using in-memory buckets: {e}")
+            return getattr(_memory_store, method)(bucket_key, self.capacity, self.refill_per_second)
+
+    @staticmethod
+    def _reject(retry_after: float):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please try again later",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def check(self, key: str):
+        """Take a token, or raise 429 if there is none."""
+        if not RATE_LIMIT_ENABLED:
+            return
+        allowed, retry_after = self._call("take", key)
+        if not allowed:
+            self._reject(retry_after)
+
+    def ensure_available(self, key: str):
+        """Raise 429 if the bucket is empty, without taking a token."""
+        if not RATE_LIMIT_ENABLED:
+            return
+        allowed, retry_after = self._call("peek", key)
+        if not allowed:
+            self._reject(retry_after)
+
+    def charge(self, key: str):
+        """Take a token after the fact, e.g. for a failed attempt."""
+        if RATE_LIMIT_ENABLED:
+            self._call("take", key)
@@ -0,0 +1,92 @@
+import re
+
+# Edit positions are UTF-16 code units, the unit JavaScript string indices use.
+# MongoDB's $substrCP counts code points; the two only agree when the text has
+# no characters outside the Basic Multilingual Plane (emoji and the like),
+# which take two UTF-16 units but one code point.
+ASTRAL_PATTERN = "[\U00010000-\U0010ffff]"
+_ASTRAL_RE = re.compile(ASTRAL_PATTERN)
+
+
+def _sorted_edits(edits):
+    """Sort edits by position and reject malformed or overlapping ranges."""
+    spans = sorted(edits, key=lambda e: (e.start, e.end))
+    previous_end = 0
+    for edit in spans:
+        if edit.start < 0 or edit.end < edit.start:
+            raise ValueError(f"Invalid edit range {edit.start}:{edit.end}")
+        if edit.start < previous_end:
+            raise ValueError(f"Edit range {edit.start}:{edit.end} overlaps a previous edit")
+        previous_end = edit.end
+    return spans
+
+
+def has_astral_characters(text: str) -> bool:
+    return bool(_ASTRAL_RE.search(text or ""))
+
+
+def bmp_only_expression(field: str):
+    """
+    MongoDB expression that is true when the field has no astral characters,
+    i.e. when UTF-16 offsets can be used as code point offsets.
+    """
+    return {"$not": [{"$regexMatch": {"input": {"$ifNull": [f"${field}", ""]}, "regex": ASTRAL_PATTERN}}]}
+
+
+def text_delta_expression(field: str, edits):
+    """
+    Build a MongoDB aggregation expression that applies edits to a string field.
+
+    Every edit replaces field[start:end] with its text, so the update can run
+    server side in a single round trip without sending the whole document
+    back and forth. Offsets are used as code points, so the update must be
+    guarded with bmp_only_expression(); otherwise use apply_utf16_delta().
+
+    Returns (expression, required_length) where required_length is the minimum
+    length the stored text must have for the edits to be in range.
+    Raises ValueError for malformed or overlapping edits.
+    """
+    source = {"$ifNull": [f"${field}", ""]}
+    parts = []
+    cursor = 0
+    for edit in _sorted_edits(edits):
+        if edit.start > cursor:
+            parts.append({"$substrCP": [source, cursor, edit.start - cursor]})
+        if edit.text:
+            # $literal so text starting with "$" is not read as a field path
+            parts.append({"$literal": edit.text})
+        cursor = edit.end
+    parts.append({"$substrCP": [source, cursor, {"$subtract": [{"$strLenCP": source}, cursor]}]})
+    return {"$concat": parts}, cursor
+
+
+def _code_point_offsets(text: str):
+    """Map every UTF-16 offset that falls on a character boundary to its code point index."""
+    offsets = {}
+    units = 0
+    for index, char in enumerate(text):
+        offsets[units] = index
+        units += 2 if ord(char) > 0xFFFF else 1
+    offsets[units] = len(text)
+    return offsets
+
+
+def apply_utf16_delta(text: str, edits):
+    """
+    Apply edits with UTF-16 offsets to text and return the result.
+    Raises ValueError if an edit is malformed, out of range or splits a
+    surrogate pair.
+    """
+    text = text or ""
+    offsets = _code_point_offsets(text)
+    parts = []
+    cursor = 0
+    for edit in _sorted_edits(edits):
+        if edit.start not in offsets or edit.end not in offsets:
+            raise ValueError(f"Edit range {edit.start}:{edit.end} is out of bounds or splits a character")
+        start, end = offsets[edit.start], offsets[edit.end]
+        parts.append(text[cursor:start])
+        parts.append(edit.text)
+        cursor = end
+    parts.append(text[cursor:])
+    return "".join(parts)
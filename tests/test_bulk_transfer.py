@@ -0,0 +1,94 @@
+from bson import ObjectId, json_util
+from pymongo import ReplaceOne
+from pymongo.errors import AutoReconnect
+
+from src.utils.bulk_transfer import import_ndjson
+
+
+class BulkResult:
+    def __init__(self, upserted, modified):
+        self.bulk_api_result = {"nInserted": 0, "nUpserted": upserted, "nModified": modified}
+
+
+class FakeCollection:
+    """Applies ReplaceOne upserts to a dict; the fail_on'th bulk_write raises."""
+
+    def __init__(self, fail_on=None):
+        self.docs = {}
+        self.calls = 0
+        self.fail_on = fail_on
+
+    def bulk_write(self, ops, ordered=True):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise AutoReconnect("connection lost")
+        upserted = modified = 0
+        for op in ops:
+            assert isinstance(op, ReplaceOne)
+            (field, value), = op._filter.items()
+            key = (field, value)
+            if key in self.docs:
+                modified += 1
+            else:
+                upserted += 1
+            self.docs[key] = op._doc
+        return BulkResult(upserted, modified)
+
+
+class FakeDB:
+    def __init__(self, fail_on=None):
+        self.blogs = FakeCollection(fail_on)
+        self.types = FakeCollection()
+
+
+def line(collection, doc):
+    return json_util.dumps({"collection": collection, "doc": doc}) + "\n"
+
+
+BLOG_LINES = [line("blogs", {"_id": ObjectId(), "title": f"Post {i}"}) for i in range(5)]
+
+
+def test_import_writes_in_batches_and_checkpoints():
+    db = FakeDB()
+    checkpoints = []
+    stats = import_ndjson(db, BLOG_LINES, batch_size=2, on_checkpoint=checkpoints.append)
+    assert stats["status"] == "complete"
+    assert stats["processed"] == 5
+    assert stats["upserted"] == 5
+    assert checkpoints == [2, 4, 5]
+    assert db.blogs.calls == 3
+
+
+def test_failed_import_returns_checkpoint_and_resumes_without_duplicates():
+    db = FakeDB(fail_on=2)
+    stats = import_ndjson(db, BLOG_LINES, batch_size=2)
+    assert stats["status"] == "partial"
+    assert stats["checkpoint"] == 2
+    assert "connection lost" in stats["error"]
+    assert len(db.blogs.docs) == 2
+
+    stats = import_ndjson(db, BLOG_LINES, batch_size=2, start_line=stats["checkpoint"])
+    assert stats["status"] == "complete"
+    assert stats["processed"] == 3
+    assert len(db.blogs.docs) == 5
+
+    # running the whole file again only replaces what is there
+    stats = import_ndjson(db, BLOG_LINES, batch_size=2)
+    assert stats["modified"] == 5
+    assert len(db.blogs.docs) == 5
+
+
+def test_types_upsert_by_name_and_documents_without_a_key_are_rejected():
+    db = FakeDB()
+    lines = [
+        line("types", {"name": "python"}),
+        line("types", {"name": "python", "image": "/uploads/py.png"}),
+        line("blogs", {"title": "No id"}),
+        "not json\n",
+        line("users", {"_id": ObjectId()}),
+    ]
+    stats = import_ndjson(db, lines)
+    assert stats["status"] == "complete"
+    assert db.types.docs == {("name", "python"): {"name": "python", "image": "/uploads/py.png"}}
+    assert db.blogs.docs == {}
+    assert [e["line"] for e in stats["errors"]] == [3, 4, 5]
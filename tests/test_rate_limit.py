@@ -0,0 +1,101 @@
+import pytest
+from fastapi import HTTPException
+
+from src.utils import rate_limit
+from src.utils.rate_limit import MemoryBucketStore, RateLimit
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def test_take_empties_the_bucket_then_reports_retry_after(clock):
+    store = MemoryBucketStore()
+    # 3 tokens, one every 10 seconds
+    assert [store.take("k", 3, 0.1)[0] for _ in range(3)] == [True, True, True]
+    allowed, retry_after = store.take("k", 3, 0.1)
+    assert not allowed
+    assert retry_after == pytest.approx(10)
+
+    clock.now += 4
+    allowed, retry_after = store.take("k", 3, 0.1)
+    assert not allowed
+    assert retry_after == pytest.approx(6)
+
+
+def test_take_refills_with_time_up_to_capacity(clock):
+    store = MemoryBucketStore()
+    for _ in range(3):
+        store.take("k", 3, 0.1)
+
+    clock.now += 10
+    assert store.take("k", 3, 0.1) == (True, 0)
+    assert not store.take("k", 3, 0.1)[0]
+
+    # a long idle period refills to capacity, not beyond
+    clock.now += 3600
+    assert [store.take("k", 3, 0.1)[0] for _ in range(4)] == [True, True, True, False]
+
+
+def test_buckets_are_per_key(clock):
+    store = MemoryBucketStore()
+    store.take("a", 1, 0.1)
+    assert not store.take("a", 1, 0.1)[0]
+    assert store.take("b", 1, 0.1)[0]
+
+
+def test_peek_does_not_take_a_token(clock):
+    store = MemoryBucketStore()
+    assert store.peek("k", 1, 0.1) == (True, 0)
+    assert store.peek("k", 1, 0.1) == (True, 0)
+    store.take("k", 1, 0.1)
+    allowed, retry_after = store.peek("k", 1, 0.1)
+    assert not allowed
+    assert retry_after == pytest.approx(10)
+
+
+def test_full_buckets_are_pruned(clock):
+    store = MemoryBucketStore(max_keys=2)
+    store.take("a", 2, 1)
+    store.take("b", 2, 1)
+    clock.now += 5
+    store.take("c", 2, 1)
+    assert set(store._buckets) == {"c"}
+
+
+def test_check_raises_429_with_rounded_up_retry_after(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "_memory_store", MemoryBucketStore())
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BACKEND", "memory")
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    limit = RateLimit("test", capacity=2, per_seconds=5)
+    limit.check("ip")
+    limit.check("ip")
+    with pytest.raises(HTTPException) as exc:
+        limit.check("ip")
+    assert exc.value.status_code == 429
+    # 2.5 seconds to the next token
+    assert exc.value.headers["Retry-After"] == "3"
+
+
+def test_charge_only_counts_failures(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "_memory_store", MemoryBucketStore())
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BACKEND", "memory")
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    limit = RateLimit("test", capacity=1, per_seconds=60)
+    for _ in range(5):
+        limit.ensure_available("user")
+    limit.charge("user")
+    with pytest.raises(HTTPException) as exc:
+        limit.ensure_available("user")
+    assert exc.value.status_code == 429
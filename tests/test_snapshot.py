@@ -0,0 +1,142 @@
+import json
+import struct
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId, json_util
+from fastapi.testclient import TestClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+from src.database import connection
+from src.database.connection import MockDB, get_read_db, get_session
+from src.database.snapshot import MAGIC, public_snapshot, write_snapshot
+from src.main import app
+
+
+class FakeCursor(list):
+    def sort(self, key, direction=1):
+        return FakeCursor(sorted(self, key=lambda d: d[key], reverse=direction == -1))
+
+
+class FakeDB:
+    def __init__(self, blogs, types):
+        self.blogs = self._collection(blogs)
+        self.types = self._collection(types)
+
+    @staticmethod
+    def _collection(docs):
+        collection = type("FakeCollection", (), {})()
+        collection.find = lambda *args, **kwargs: FakeCursor(docs)
+        return collection
+
+
+class UnreachableDB(MockDB):
+    """Fails like a MongoClient whose servers cannot be selected."""
+
+    calls = 0
+
+    def __call__(self, *args, **kwargs):
+        UnreachableDB.calls += 1
+        raise ServerSelectionTimeoutError("no servers")
+
+
+NOW = datetime(2026, 1, 1)
+BLOGS = [
+    {"_id": ObjectId(), "title": "Oldest", "type": "python", "views": 50, "created_at": NOW - timedelta(days=2)},
+    {"_id": ObjectId(), "title": "Newest", "type": "go", "views": 5, "created_at": NOW},
+    {"_id": ObjectId(), "title": "Middle", "type": "python", "views": 10, "created_at": NOW - timedelta(days=1), "content": "café \U0001F600"},
+]
+TYPES = [{"_id": ObjectId(), "name": "python", "image": None}, {"_id": ObjectId(), "name": "go", "image": "/uploads/go.png"}]
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    path = tmp_path / "snapshot.bin"
+    write_snapshot(FakeDB(BLOGS, TYPES), path)
+    monkeypatch.setattr(public_snapshot, "path", path)
+    public_snapshot.close()
+    yield public_snapshot.current()
+    public_snapshot.close()
+
+
+@pytest.fixture
+def client(snapshot, monkeypatch):
+    monkeypatch.setattr(connection, "_circuit_open_until", 0.0)
+    app.dependency_overrides[get_read_db] = MockDB
+    app.dependency_overrides[get_session] = lambda: None
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_snapshot_round_trip(snapshot):
+    assert snapshot.blog_types == ["go", "python"]
+    assert [t["name"] for t in snapshot.types] == ["go", "python"]
+    assert snapshot.age_seconds() < 60
+
+    post = snapshot.get_post(str(BLOGS[2]["_id"]))
+    assert post["_id"] == BLOGS[2]["_id"]
+    assert post["content"] == "café \U0001F600"
+    assert snapshot.get_post(str(ObjectId())) is None
+
+    total, docs = snapshot.list_posts()
+    assert total == 3
+    assert [d["title"] for d in docs] == ["Newest", "Middle", "Oldest"]
+
+
+def test_snapshot_footer_points_at_the_index(snapshot):
+    raw = public_snapshot.path.read_bytes()
+    magic, index_offset, index_length = struct.unpack("<8sQQ", raw[-24:])
+    assert magic == MAGIC
+    assert index_offset + index_length == len(raw) - 24
+    index = json.loads(raw[index_offset:index_offset + index_length])
+    # each post's offset and length slice exactly its own payload
+    for blog_id, _, _, offset, length in index["posts"]:
+        assert json_util.loads(raw[offset:offset + length])["_id"] == ObjectId(blog_id)
+
+
+def test_snapshot_list_posts_filters_sorts_and_pages(snapshot):
+    total, docs = snapshot.list_posts(type="python")
+    assert total == 2
+    assert [d["title"] for d in docs] == ["Middle", "Oldest"]
+
+    total, docs = snapshot.list_posts(sort="popular", skip=1, limit=1)
+    assert total == 3
+    assert [d["title"] for d in docs] == ["Middle"]
+
+
+def test_truncated_snapshot_is_ignored(tmp_path, monkeypatch):
+    path = tmp_path / "snapshot.bin"
+    path.write_bytes(b"BSNAP")
+    monkeypatch.setattr(public_snapshot, "path", path)
+    public_snapshot.close()
+    assert public_snapshot.current() is None
+
+
+def test_get_blog_falls_back_to_snapshot(client):
+    response = client.get(f"/blogs/{BLOGS[1]['_id']}")
+    assert response.status_code == 200
+    assert response.json()["title"] == "Newest"
+    assert response.headers["X-Served-From"] == "snapshot"
+    assert "Age" in response.headers
+
+    assert client.get(f"/blogs/{ObjectId()}").status_code == 404
+
+
+def test_list_blogs_falls_back_to_snapshot(client):
+    response = client.get("/blogs/", params={"type": "python", "sort": "popular"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 2
+    assert [b["title"] for b in body["items"]] == ["Oldest", "Middle"]
+    assert response.headers["X-Served-From"] == "snapshot"
+
+
+def test_connection_failure_opens_the_circuit(client, monkeypatch):
+    UnreachableDB.calls = 0
+    del app.dependency_overrides[get_read_db]
+    monkeypatch.setattr(connection, "read_db", UnreachableDB())
+    for _ in range(3):
+        response = client.get("/blogs/")
+        assert response.headers["X-Served-From"] == "snapshot"
+    # only the first request waited on the database
+    assert UnreachableDB.calls == 1
@@ -0,0 +1,89 @@
+import re
+from collections import namedtuple
+
+import pytest
+
+from src.utils.text_delta import (
+    ASTRAL_PATTERN,
+    apply_utf16_delta,
+    has_astral_characters,
+    text_delta_expression,
+)
+
+Edit = namedtuple("Edit", "start end text")
+
+
+def evaluate(expr, doc):
+    """Evaluate the small subset of aggregation operators the delta uses."""
+    if isinstance(expr, str):
+        return doc.get(expr[1:]) if expr.startswith("$") else expr
+    if not isinstance(expr, dict):
+        return expr
+    (op, args), = expr.items()
+    if op == "$literal":
+        return args
+    if op == "$ifNull":
+        value = evaluate(args[0], doc)
+        return evaluate(args[1], doc) if value is None else value
+    if op == "$concat":
+        return "".join(evaluate(a, doc) for a in args)
+    if op == "$substrCP":
+        text, start, count = (evaluate(a, doc) for a in args)
+        return text[start:start + count]
+    if op == "$strLenCP":
+        return len(evaluate(args, doc))
+    if op == "$subtract":
+        return evaluate(args[0], doc) - evaluate(args[1], doc)
+    raise AssertionError(f"unexpected operator {op}")
+
+
+def js_apply(text, edits):
+    """Reference result: apply edits the way a browser editor would, on UTF-16 units."""
+    units = text.encode("utf-16-le")
+    for edit in sorted(edits, key=lambda e: e.start, reverse=True):
+        units = units[:edit.start * 2] + edit.text.encode("utf-16-le") + units[edit.end * 2:]
+    return units.decode("utf-16-le")
+
+
+def test_expression_applies_edits_to_bmp_text():
+    edits = [Edit(6, 11, "there"), Edit(0, 0, ">> "), Edit(12, 12, "$not a field")]
+    expr, required_length = text_delta_expression("content", edits)
+    assert required_length == 12
+    assert evaluate(expr, {"content": "hello world!"}) == js_apply("hello world!", edits)
+
+
+def test_expression_treats_missing_content_as_empty():
+    expr, _ = text_delta_expression("content", [Edit(0, 0, "first words")])
+    assert evaluate(expr, {}) == "first words"
+
+
+def test_overlapping_edits_are_rejected():
+    with pytest.raises(ValueError):
+        text_delta_expression("content", [Edit(0, 5, "a"), Edit(3, 8, "b")])
+    with pytest.raises(ValueError):
+        apply_utf16_delta("hello world", [Edit(4, 2, "")])
+
+
+def test_astral_text_is_detected_by_the_server_guard():
+    text = "I 💜 emoji, then more words"
+    assert has_astral_characters(text)
+    assert re.search(ASTRAL_PATTERN, text)
+    assert not has_astral_characters("café — naïve")
+
+    # code point offsets would land one character too far left
+    edits = [Edit(12, 16, "THEN")]
+    expr, _ = text_delta_expression("content", edits)
+    assert evaluate(expr, {"content": text}) != js_apply(text, edits)
+
+
+def test_utf16_offsets_are_converted_around_astral_characters():
+    text = "I 💜 emoji, then more words 🎉 end"
+    edits = [Edit(12, 16, "THEN"), Edit(30, 30, "!"), Edit(31, 34, "fin")]
+    assert apply_utf16_delta(text, edits) == js_apply(text, edits)
+
+
+def test_offset_inside_a_surrogate_pair_is_rejected():
+    with pytest.raises(ValueError):
+        apply_utf16_delta("a💜b", [Edit(2, 3, "x")])
+    with pytest.raises(ValueError):
+        apply_utf16_delta("a💜b", [Edit(0, 10, "x")])
@@ -0,0 +1,103 @@
+# run from project root:
+#   python transfer_content.py export -o backup.ndjson
+#   python transfer_content.py import backup.ndjson
+import argparse
+import os
+import sys
+
+from src.database.connection import db
+from src.utils.bulk_transfer import (
+    TRANSFER_COLLECTIONS,
+    IMPORT_BATCH_SIZE,
+    export_ndjson,
+    import_ndjson,
+)
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def write_checkpoint(path, line_no):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(str(line_no))
+    os.replace(tmp, path)
+
+
+def run_export(args):
+    collections = args.collections.split(",") if args.collections else TRANSFER_COLLECTIONS
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    count = 0
+    try:
+        for line in export_ndjson(db, collections):
+            out.write(line)
+            count += 1
+    finally:
+        if args.output:
+            out.close()
+    print(f"exported {count} documents", file=sys.stderr)
+
+
+def run_import(args):
+    checkpoint_path = args.checkpoint or f"{args.input}.checkpoint"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    start_line = read_checkpoint(checkpoint_path)
+    if start_line:
+        print(f"resuming after line {start_line}")
+
+    def on_checkpoint(line_no):
+        write_checkpoint(checkpoint_path, line_no)
+        print(f"committed through line {line_no}")
+
+    with open(args.input, "rb") as f:
+        stats = import_ndjson(
+            db,
+            f,
+            batch_size=args.batch_size,
+            start_line=start_line,
+            on_checkpoint=on_checkpoint,
+        )
+
+    for err in stats["errors"]:
+        print(f"line {err['line']}: {err['error']}")
+    print(
+        f"processed {stats['processed']}, inserted {stats['inserted']}, "
+        f"upserted {stats['upserted']}, modified {stats['modified']}"
+    )
+    if stats["status"] == "partial":
+        print(f"import stopped: {stats['error']}")
+        print(f"run the same command again to resume after line {stats['checkpoint']}")
+        sys.exit(1)
+    # the file was fully read, so the next run should start from scratch
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import blogs and types as NDJSON")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export")
+    export_parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    export_parser.add_argument("--collections", help="comma separated, default: blogs,types")
+    export_parser.set_defaults(func=run_export)
+
+    import_parser = sub.add_parser("import")
+    import_parser.add_argument("input", help="NDJSON file to import")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    import_parser.add_argument("--checkpoint", help="checkpoint file (default: <input>.checkpoint)")
+    import_parser.add_argument("--restart", action="store_true", help="ignore any existing checkpoint")
+    import_parser.set_defaults(func=run_import)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()